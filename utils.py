@@ -1,16 +1,213 @@
+import atexit
+import bisect
+import heapq
+import numpy as np
 import requests
 import streamlit as st
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
+import threading
 import time
+from functools import lru_cache, wraps
+from math import prod
+import orjson
 
 # **API Configuration**
 ODDS_API_URL = "https://api.the-odds-api.com/v4/sports/basketball_nba/odds"
 EVENT_ODDS_API_URL = "https://api.the-odds-api.com/v4/sports/basketball_nba/events/{event_id}/odds"
 BALL_DONT_LIE_API_URL = "https://api.balldontlie.io/v1"
+REQUEST_TIMEOUT = (3, 10)  # (connect, read) seconds
+ODDS_API_PARAMS = {"regions": "us", "bookmakers": "fanduel"}  # Shared by every Odds API request
+MAX_WORKERS = 8
+
+# **HTTP Session** (keep-alive connections shared by every request and worker thread)
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "TestSGP/1.0", "Accept": "application/json"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,  # hand the last response back so callers can report its status
+        respect_retry_after_header=False  # a long Retry-After would stall the script thread; stale/failure caching covers 429s
+    )
+))
+atexit.register(SESSION.close)
+
+# **Thread Pool** (overlaps independent API requests; sized to the session's connection pool)
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+def _parse_json(response):
+    """
+    Decode a JSON response body with orjson.
+    """
+    return orjson.loads(response.content)
 
 # **Cache Configuration**
 CACHE = {}
 CACHE_EXPIRATION = timedelta(minutes=15)
+GAMES_CACHE_EXPIRATION = timedelta(hours=6)  # the day's matchups don't change; the key rolls over at midnight
+EVENT_ID_CACHE_EXPIRATION = timedelta(hours=1)
+STALE_CACHE_GRACE = timedelta(hours=3)  # how long expired data may still be served if an API is down
+FAILURE_CACHE_EXPIRATION = timedelta(seconds=30)  # how long a failed fetch is remembered before retrying
+CACHE_LOCK = threading.Lock()  # serializes writes from the Streamlit sessions and worker threads
+FETCH_FAILED = object()  # cached in place of data that can't be represented by an empty result
+
+STALE_NOTICE = ("info", "ℹ️ Serving cached data — upstream unavailable.")
+
+def _cache_lookup(key):
+    """
+    Answer a fetch from the cache without calling the API.
+
+    Returns:
+        tuple: (data, notice) for fresh data or a remembered failure, or for stale data while
+        upstream retries are held off after a failure; None if the API should be called.
+    """
+    entry = CACHE.get(key)
+    if not entry:
+        return None
+    now = time.time()
+    if now < entry["expires_at"]:
+        return entry["data"], entry["notice"]
+    if now < entry["retry_after"] and now < entry["stale_until"]:
+        return entry["data"], STALE_NOTICE
+    return None
+
+def _cache_set(key, data, expiration=CACHE_EXPIRATION, headers=None, stale_grace=STALE_CACHE_GRACE, notice=None):
+    """
+    Cache data under a key until the expiration elapses, evicting entries past their stale window.
+
+    The ETag / Last-Modified validators from the response headers are kept so the
+    entry can be revalidated with a conditional request once it expires.
+    """
+    with CACHE_LOCK:
+        now = time.time()
+        for stale_key in [k for k, entry in CACHE.items() if entry["stale_until"] <= now]:
+            del CACHE[stale_key]
+        expires_at = now + expiration.total_seconds()
+        CACHE[key] = {
+            "data": data,
+            "expires_at": expires_at,
+            "stale_until": expires_at + stale_grace.total_seconds(),
+            "stored_at": now,
+            "retry_after": 0,  # set while stale data is served after a failure, to back off the API
+            "notice": notice,  # (st method name, message) shown whenever this entry is returned
+            "validators": {name: headers[name] for name in ("ETag", "Last-Modified") if headers and name in headers}
+        }
+
+def _cache_failure(key, empty_result, message):
+    """
+    Briefly cache the empty result of a failed fetch so reruns don't hammer a failing API.
+
+    The entry has no stale window, so it is never served as a fallback for real data, and
+    it carries the error so every session that gets the empty result is told why.
+
+    Returns:
+        tuple: (empty_result, error notice).
+    """
+    notice = ("error", message)
+    _cache_set(key, empty_result, FAILURE_CACHE_EXPIRATION, stale_grace=timedelta(0), notice=notice)
+    return empty_result, notice
+
+def _revalidation_headers(entry):
+    """
+    Build If-None-Match / If-Modified-Since request headers from an expired cache entry.
+    """
+    if not entry:
+        return {}
+    validators = entry["validators"]
+    headers = {}
+    if "ETag" in validators:
+        headers["If-None-Match"] = validators["ETag"]
+    if "Last-Modified" in validators:
+        headers["If-Modified-Since"] = validators["Last-Modified"]
+    return headers
+
+def _serve_stale(key):
+    """
+    Fall back to an expired cache entry after an upstream failure.
+
+    The entry stays expired, but upstream retries are held off for FAILURE_CACHE_EXPIRATION;
+    until then _cache_lookup keeps returning it, labelled as stale, without calling the API.
+
+    Returns:
+        tuple: (stale data, stale notice), or None if there is none and the caller
+        should report the error itself.
+    """
+    entry = CACHE.get(key)
+    now = time.time()
+    if entry and now < entry["stale_until"] and entry["data"] is not FETCH_FAILED:
+        with CACHE_LOCK:
+            entry["retry_after"] = now + FAILURE_CACHE_EXPIRATION.total_seconds()
+        return entry["data"], STALE_NOTICE
+    return None
+
+def _show_notice(result):
+    """
+    Show a fetch result's notice (if any) in the calling session and return its data.
+
+    Fetches may be shared between sessions or run on worker threads, so they hand their
+    notices back with the data instead of calling Streamlit themselves.
+    """
+    data, notice = result
+    if notice is not None:
+        level, message = notice
+        getattr(st, level)(message)
+    return data
+
+def _single_flight(fetch):
+    """
+    Decorator that lets concurrent calls with the same arguments share one in-flight request.
+
+    When a cache entry expires, every session rerunning at that moment would otherwise
+    hit the API; instead the first call fetches and the others wait for its result.
+    """
+    inflight = {}
+    lock = threading.Lock()
+
+    @wraps(fetch)
+    def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        with lock:
+            future = inflight.get(key)
+            leader = future is None
+            if leader:
+                future = inflight[key] = Future()
+        if not leader:
+            try:
+                return future.result()
+            except BaseException:
+                # The leading call was interrupted (e.g. its session reran), so fetch independently
+                return fetch(*args, **kwargs)
+
+        try:
+            result = fetch(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with lock:
+                del inflight[key]
+
+    return wrapper
+
+# **API Keys**
+@lru_cache(maxsize=None)
+def _api_key(name):
+    """
+    Read an API key from Streamlit secrets once per process.
+
+    A missing key raises on every call (exceptions are not cached), so the
+    callers' existing error handling still reports it.
+    """
+    return st.secrets[name]
 
 # **Category Mapping for Props**
 category_map = {
@@ -24,25 +221,57 @@ category_map = {
     "player_points_rebounds_assists": "P + R + A"
 }
 
+# Categories in display order; a category's position is its compact category id
+CATEGORIES = tuple(category_map.values())
+
+# Every market key the props response can contain, including "_alternate" lines,
+# mapped straight to its category id so outcomes need no string processing
+market_category_ids = {
+    market_key + suffix: category_id
+    for category_id, market_key in enumerate(category_map)
+    for suffix in ("", "_alternate")
+}
+
+# Player prop markets requested from The Odds API by default (one per category)
+PROP_MARKETS = tuple(category_map)
+PROP_MARKETS_PARAM = ",".join(PROP_MARKETS)
+
 def get_nba_games():
     """
     Fetch NBA games for today from the Balldontlie API with caching.
     """
     today = datetime.today().strftime("%Y-%m-%d")
-    if "games" in CACHE and time.time() - CACHE["games"]["timestamp"] < CACHE_EXPIRATION.total_seconds():
-        return CACHE["games"]["data"]
+    return _show_notice(_cache_lookup(f"games_{today}") or _fetch_games(today))
+
+@_single_flight
+def _fetch_games(today):
+    """
+    Fetch the games for a date from the Balldontlie API.
+
+    Returns:
+        tuple: (formatted games, notice) for get_nba_games to report.
+    """
+    cache_key = f"games_{today}"
+    cached_games = _cache_lookup(cache_key)  # a call that just finished may have filled it
+    if cached_games is not None:
+        return cached_games
+    expired_entry = CACHE.get(cache_key)
 
     try:
         url = f"{BALL_DONT_LIE_API_URL}/games"
-        headers = {"Authorization": st.secrets["balldontlie_api_key"]}
+        headers = {"Authorization": _api_key("balldontlie_api_key"), **_revalidation_headers(expired_entry)}
         params = {"dates[]": today}
 
-        response = requests.get(url, headers=headers, params=params)
+        response = SESSION.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            _cache_set(cache_key, expired_entry["data"], GAMES_CACHE_EXPIRATION, expired_entry["validators"])
+            return expired_entry["data"], None
         if response.status_code != 200:
-            st.error(f"❌ Error fetching games: {response.status_code} - {response.text}")
-            return []
+            return _serve_stale(cache_key) or _cache_failure(
+                cache_key, [], f"❌ Error fetching games: {response.status_code} - {response.text}"
+            )
 
-        games_data = response.json().get("data", [])
+        games_data = _parse_json(response).get("data", [])
         formatted_games = [
             {
                 "home_team": game["home_team"]["full_name"],
@@ -52,87 +281,201 @@ def get_nba_games():
             }
             for game in games_data
         ]
-        CACHE["games"] = {"data": formatted_games, "timestamp": time.time()}
-        return formatted_games
+        _cache_set(cache_key, formatted_games, GAMES_CACHE_EXPIRATION, response.headers)
+        return formatted_games, None
     except Exception as e:
-        st.error(f"❌ Unexpected error fetching games: {e}")
-        return []
+        return _serve_stale(cache_key) or _cache_failure(cache_key, [], f"❌ Unexpected error fetching games: {e}")
 
-def get_event_id(selected_game):
+def get_event_index():
     """
-    Retrieve the event ID from The Odds API for a given NBA game with caching.
+    Fetch today's events from The Odds API and index their IDs by (home_team, away_team), with caching.
+
+    Returns:
+        dict: Maps (home_team, away_team) to the event ID, or None if the request failed.
+    """
+    by_matchup = _show_notice(_cache_lookup("event_index") or _fetch_event_index())
+    return None if by_matchup is FETCH_FAILED else by_matchup
+
+@_single_flight
+def _fetch_event_index():
     """
-    if "event_id" in CACHE and selected_game["game_id"] in CACHE["event_id"]:
-        return CACHE["event_id"][selected_game["game_id"]]
+    Fetch today's events from The Odds API and index them by matchup.
+
+    Returns:
+        tuple: (index or FETCH_FAILED, notice) for get_event_index to report.
+    """
+    cached_index = _cache_lookup("event_index")  # a call that just finished may have filled it
+    if cached_index is not None:
+        return cached_index
+    expired_entry = CACHE.get("event_index")
 
     try:
-        response = requests.get(
+        response = SESSION.get(
             ODDS_API_URL,
             params={
-                "apiKey": st.secrets["odds_api_key"],
-                "regions": "us",
+                "apiKey": _api_key("odds_api_key"),
                 "markets": "h2h",
-                "bookmakers": "fanduel",
-            }
+                **ODDS_API_PARAMS
+            },
+            headers=_revalidation_headers(expired_entry),
+            timeout=REQUEST_TIMEOUT
         )
+        if response.status_code == 304:
+            _cache_set("event_index", expired_entry["data"], EVENT_ID_CACHE_EXPIRATION, expired_entry["validators"])
+            return expired_entry["data"], None
         if response.status_code != 200:
-            st.error(f"❌ Error fetching event ID: {response.status_code} - {response.text}")
-            return None
-
-        events_data = response.json()
-        for event in events_data:
-            if event["home_team"] == selected_game["home_team"] and event["away_team"] == selected_game["away_team"]:
-                CACHE.setdefault("event_id", {})[selected_game["game_id"]] = event["id"]
-                return event["id"]
-        st.warning(f"⚠️ No matching event found for {selected_game['home_team']} vs {selected_game['away_team']}")
-        return None
+            return _serve_stale("event_index") or _cache_failure(
+                "event_index", FETCH_FAILED, f"❌ Error fetching event ID: {response.status_code} - {response.text}"
+            )
+
+        by_matchup = {(event["home_team"], event["away_team"]): event["id"] for event in _parse_json(response)}
+        _cache_set("event_index", by_matchup, EVENT_ID_CACHE_EXPIRATION, response.headers)
+        return by_matchup, None
     except Exception as e:
-        st.error(f"❌ Unexpected error fetching event ID: {e}")
+        return _serve_stale("event_index") or _cache_failure(
+            "event_index", FETCH_FAILED, f"❌ Unexpected error fetching event ID: {e}"
+        )
+
+def _refresh_event_index():
+    """
+    Expire the cached event index after a lookup miss so the next call refetches it.
+
+    Events the Odds API lists after the index was fetched would otherwise stay missing
+    until it expires; refreshes are limited to one per FAILURE_CACHE_EXPIRATION.
+
+    Returns:
+        bool: True if the index was expired and should be looked up again.
+    """
+    entry = CACHE.get("event_index")
+    now = time.time()
+    if (entry is None or now >= entry["expires_at"] or entry["data"] is FETCH_FAILED
+            or now - entry["stored_at"] < FAILURE_CACHE_EXPIRATION.total_seconds()):
+        return False
+    with CACHE_LOCK:
+        entry["expires_at"] = now
+    return True
+
+def get_event_id(selected_game):
+    """
+    Retrieve the event ID from The Odds API for a given NBA game with caching.
+    """
+    by_matchup = get_event_index()
+    if by_matchup is None:
         return None
 
-def fetch_all_props(event_id):
+    matchup = (selected_game["home_team"], selected_game["away_team"])
+    event_id = by_matchup.get(matchup)
+    if event_id is None and _refresh_event_index():
+        event_id = (get_event_index() or by_matchup).get(matchup)
+    if event_id:
+        return event_id
+    st.warning(f"⚠️ No matching event found for {selected_game['home_team']} vs {selected_game['away_team']}")
+    return None
+
+def get_event_ids(selected_games):
+    """
+    Retrieve event IDs for several NBA games with a single (cached) Odds API request.
+
+    Args:
+        selected_games (list): Game dicts as returned by get_nba_games().
+
+    Returns:
+        dict: Maps each game's 'game_id' to its Odds API event ID (or None if not found).
+    """
+    by_matchup = get_event_index() or {}
+    matchups = {game["game_id"]: (game["home_team"], game["away_team"]) for game in selected_games}
+    if not all(matchup in by_matchup for matchup in matchups.values()) and _refresh_event_index():
+        by_matchup = get_event_index() or by_matchup
+    return {game_id: by_matchup.get(matchup) for game_id, matchup in matchups.items()}
+
+def _props_cache_key(event_id, markets):
     """
-    Fetch all player props for a game from The Odds API in a single call with caching.
+    Cache key for an event's props payload over a tuple of market keys.
+    """
+    markets_param = PROP_MARKETS_PARAM if markets is PROP_MARKETS else ",".join(markets)
+    return f"props_{event_id}_{markets_param}"
+
+def fetch_all_props(event_id, markets=PROP_MARKETS):
     """
-    cache_key = f"props_{event_id}"
-    if cache_key in CACHE and time.time() - CACHE[cache_key]["timestamp"] < CACHE_EXPIRATION.total_seconds():
-        return CACHE[cache_key]["data"]
+    Fetch player props for a game from The Odds API in a single call with caching.
+
+    Args:
+        event_id (str): The Odds API event ID.
+        markets (iterable, optional): Prop market keys to request (default: every category).
+
+    Returns:
+        dict: The event odds payload, or {} if the request failed.
+    """
+    # Normalize to a tuple so the call is hashable for request coalescing (lists are accepted too)
+    markets = tuple(markets)
+    return _show_notice(_cache_lookup(_props_cache_key(event_id, markets)) or _fetch_props(event_id, markets))
+
+@_single_flight
+def _fetch_props(event_id, markets):
+    """
+    Fetch the props payload for an event and a tuple of market keys.
+
+    Returns:
+        tuple: (payload or {}, notice) for the caller to report.
+    """
+    cache_key = _props_cache_key(event_id, markets)
+    cached_props = _cache_lookup(cache_key)  # a call that just finished may have filled it
+    if cached_props is not None:
+        return cached_props
+    expired_entry = CACHE.get(cache_key)
 
     try:
         api_url = EVENT_ODDS_API_URL.format(event_id=event_id)
         params = {
-            "apiKey": st.secrets["odds_api_key"],
-            "regions": "us",
-            "markets": "player_points,player_rebounds,player_assists,player_threes,"
-                       "player_points_rebounds,player_points_assists,player_rebounds_assists,player_points_rebounds_assists",
-            "bookmakers": "fanduel"
+            "apiKey": _api_key("odds_api_key"),
+            "markets": PROP_MARKETS_PARAM if markets is PROP_MARKETS else ",".join(markets),
+            **ODDS_API_PARAMS
         }
-        response = requests.get(api_url, params=params)
+        response = SESSION.get(api_url, params=params, headers=_revalidation_headers(expired_entry), timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            _cache_set(cache_key, expired_entry["data"], headers=expired_entry["validators"])
+            return expired_entry["data"], None
         if response.status_code == 200:
-            data = response.json()
-            CACHE[cache_key] = {"data": data, "timestamp": time.time()}
-            return data
+            data = _parse_json(response)
+            _cache_set(cache_key, data, headers=response.headers)
+            return data, None
         else:
-            st.error(f"❌ Error fetching props: {response.status_code} - {response.text}")
-            return {}
+            return _serve_stale(cache_key) or _cache_failure(
+                cache_key, {}, f"❌ Error fetching props: {response.status_code} - {response.text}"
+            )
     except Exception as e:
-        st.error(f"❌ Unexpected error fetching props: {e}")
-        return {}
+        return _serve_stale(cache_key) or _cache_failure(cache_key, {}, f"❌ Unexpected error fetching props: {e}")
+
+# **Risk Levels** (bucket edges for bisect/np.digitize and the risk level of each bucket)
+RISK_BOUNDS = (-450, -299, -199, 101, 251)
+RISK_BINS = np.array(RISK_BOUNDS)
+RISK_LEVELS = (
+    ("Very High Risk", "🔴"),  # below -450
+    ("Very Safe", "🔵"),       # -450 to -300
+    ("Safe", "🟢"),            # -299 to -200
+    ("Moderate Risk", "🟡"),   # -199 to +100
+    ("High Risk", "🟠"),       # +101 to +250
+    ("Very High Risk", "🔴")   # +251 and above
+)
+RISK_LABELS = tuple(f"{emoji} {risk_level}" for risk_level, emoji in RISK_LEVELS)
+
+def get_risk_labels(odds):
+    """
+    Label each of several American odds with its risk level in one vectorized pass.
+
+    Args:
+        odds (array-like): American odds (e.g., [-350, 120]).
+
+    Returns:
+        list: "emoji risk_level" display strings (e.g., "🔵 Very Safe"), one per odds value.
+    """
+    return [RISK_LABELS[bucket] for bucket in np.digitize(odds, RISK_BINS).tolist()]
 
 def get_risk_level(odds):
     """
     Assign a risk level and emoji based on betting odds.
     """
-    if -450 <= odds <= -300:
-        return "Very Safe", "🔵"
-    elif -299 <= odds <= -200:
-        return "Safe", "🟢"
-    elif -199 <= odds <= 100:
-        return "Moderate Risk", "🟡"
-    elif 101 <= odds <= 250:
-        return "High Risk", "🟠"
-    else:
-        return "Very High Risk", "🔴"
+    return RISK_LEVELS[bisect.bisect_right(RISK_BOUNDS, odds)]
 
 def calculate_parlay_odds(american_odds_list):
     """
@@ -147,19 +490,11 @@ def calculate_parlay_odds(american_odds_list):
     if not american_odds_list:
         return None
 
-    # Convert each American odds to decimal odds
-    decimal_odds = []
-    for odds in american_odds_list:
-        if odds >= 0:
-            decimal = 1 + (odds / 100)
-        else:
-            decimal = 1 + (100 / abs(odds))
-        decimal_odds.append(decimal)
-
-    # Multiply all decimal odds together
-    combined_decimal = 1
-    for dec in decimal_odds:
-        combined_decimal *= dec
+    # Convert each American odds to decimal odds and multiply them together
+    combined_decimal = prod(
+        1 + (odds / 100) if odds >= 0 else 1 + (100 / abs(odds))
+        for odds in american_odds_list
+    )
 
     # Convert back to American odds
     if combined_decimal >= 2:
@@ -169,7 +504,34 @@ def calculate_parlay_odds(american_odds_list):
 
     return parlay_odds
 
-def fetch_sgp_builder(selected_game, num_props=1, min_odds=None, max_odds=None, confidence_level=None):
+def score_prices(decimal_prices):
+    """
+    Convert decimal odds to American odds and compute their probabilities in one vectorized pass.
+
+    Args:
+        decimal_prices (list): Decimal odds as returned by The Odds API (e.g., [1.91, 2.5]).
+
+    Returns:
+        tuple: NumPy arrays of American odds, implied probability (rounded to 3 places),
+        AI probability (rounded to 3 places) and confidence boost (percent, rounded to 2 places).
+    """
+    prices = np.asarray(decimal_prices, dtype=np.float64)
+
+    # Convert Decimal Odds to American Odds (truncating like int())
+    with np.errstate(divide="ignore", invalid="ignore"):
+        american_odds = np.where(prices >= 2.0, (prices - 1) * 100, -100 / (prices - 1)).astype(np.int64)
+        implied_prob = np.where(
+            american_odds < 0,
+            1 / (1 + np.abs(american_odds) / 100),
+            american_odds / (100 + american_odds)
+        )
+    ai_prob = implied_prob  # Placeholder: No AI model
+    confidence_boost = np.round(ai_prob * 100, 2)
+
+    return american_odds, np.round(implied_prob, 3), np.round(ai_prob, 3), confidence_boost
+
+def fetch_sgp_builder(selected_game, num_props=1, min_odds=None, max_odds=None, confidence_level=None,
+                      markets=PROP_MARKETS):
     """
     Fetch and process player props for a Same Game Parlay (SGP) with optimized selection logic.
     Always includes the combined parlay odds for the selected props.
@@ -180,96 +542,116 @@ def fetch_sgp_builder(selected_game, num_props=1, min_odds=None, max_odds=None,
         min_odds (int, optional): Minimum odds filter.
         max_odds (int, optional): Maximum odds filter.
         confidence_level (tuple, optional): Confidence range filter (min, max).
+        markets (tuple, optional): Prop market keys to request (default: every category).
 
     Returns:
         dict: Contains 'selected_props' and 'parlay_odds'.
     """
+    # Nothing can be selected for an empty parlay, so skip the API calls entirely
+    if num_props <= 0:
+        st.warning("🚨 No valid props found after filtering.")
+        return {}
+
     # Get the correct event ID
     event_id = get_event_id(selected_game)
     if not event_id:
         return {}
 
     # Fetch prop data
-    odds_data = fetch_all_props(event_id)
-    if not odds_data.get("bookmakers"):
+    odds_data = fetch_all_props(event_id, markets)
+    bookmakers = odds_data.get("bookmakers")
+    if not bookmakers:
         st.error("❌ No bookmakers data available in the API response.")
         return {}
-    fanduel = next((b for b in odds_data.get("bookmakers", []) if b["key"] == "fanduel"), None)
+    # Props are requested with bookmakers=fanduel, so FanDuel is the only bookmaker returned
+    fanduel = bookmakers[0] if bookmakers[0].get("key") == "fanduel" else None
     if not fanduel or not fanduel.get("markets"):
         st.error("❌ FanDuel data or markets not available for this event.")
         return {}
 
-    # Initialize prop categories
-    prop_categories = {cat: [] for cat in category_map.values()}
-
-    # Process each market
+    # Collect the raw outcomes of each market as columns, keeping one copy of any bet that
+    # is listed in both the base and the alternate market (flagged alt_line if either is)
+    outcomes = []
+    category_ids = []
+    prices = []
+    seen_bets = {}
     for market in fanduel["markets"]:
+        category_id = market_category_ids.get(market["key"])
+        if category_id is None:
+            continue
+        alt_line = market["key"].endswith("_alternate")
         for outcome in market.get("outcomes", []):
             player_name = outcome.get("description", "Unknown Player")
-            prop_key = market["key"].replace("_alternate", "")
-            category = category_map.get(prop_key, "Other")
-            if category == "Other":
-                continue
-            over_under = "Over" if "Over" in outcome["name"] else "Under"
+            over_under = "Over" if outcome["name"] == "Over" else "Under"
             line_value = outcome.get("point", "N/A")
-            odds = outcome["price"]
-
-            # Convert Decimal Odds to American Odds
-            if odds >= 2.0:
-                american_odds = int((odds - 1) * 100)
+            bet = (category_id, player_name, over_under, line_value, outcome["price"])
+            i = seen_bets.get(bet)
+            if i is not None:
+                if alt_line:
+                    outcomes[i] = (player_name, over_under, line_value, True)
+                continue
+            seen_bets[bet] = len(outcomes)
+            outcomes.append((player_name, over_under, line_value, alt_line))
+            category_ids.append(category_id)
+            prices.append(outcome["price"])
+
+    # Score all outcomes at once and apply the filters as a boolean mask
+    american_odds, implied_probs, ai_probs, confidence_boosts = score_prices(prices)
+    mask = np.ones(len(outcomes), dtype=bool)
+    if min_odds is not None:
+        mask &= american_odds >= min_odds
+    if max_odds is not None:
+        mask &= american_odds <= max_odds
+    if confidence_level:
+        mask &= (confidence_boosts >= confidence_level[0]) & (confidence_boosts <= confidence_level[1])
+
+    # Select props in one walk over the filtered outcomes, ranked by confidence (ties in category
+    # order): the first prop seen in a category is its best, every later one is a runner-up.
+    # The best prop of each category goes in first, then the highest remaining runners-up.
+    category_ids = np.asarray(category_ids, dtype=np.int8)
+    candidates = np.flatnonzero(mask)
+    ranked = candidates[np.lexsort((category_ids[candidates], -confidence_boosts[candidates]))]
+    if num_props == 1:
+        # A single prop is simply the top-ranked outcome, so the category walk can be skipped
+        selected = ranked[:1].tolist()
+    else:
+        selected = []
+        runners_up = []
+        seen_categories = set()
+        for i, category_id in zip(ranked.tolist(), category_ids[ranked].tolist()):
+            if category_id in seen_categories:
+                # At most num_props runners-up can ever be used to fill the parlay
+                if len(runners_up) < num_props:
+                    runners_up.append(i)
+                elif len(seen_categories) == len(CATEGORIES):
+                    break
             else:
-                american_odds = int(-100 / (odds - 1))
-            implied_prob = 1 / (1 + abs(american_odds) / 100) if american_odds < 0 else american_odds / (100 + american_odds)
-            ai_prob = implied_prob  # Placeholder: No AI model
-            confidence_boost = round(ai_prob * 100, 2)
-            betting_edge = 0
-            risk_level, emoji = get_risk_level(american_odds)
-            insight_reason = f"{player_name} has a {confidence_boost:.0f}% chance based on implied probability."
-
-            prop_data = {
-                "player": player_name,
-                "over_under": over_under,
-                "prop": category,
-                "line": line_value,
-                "odds": american_odds,
-                "implied_prob": round(implied_prob, 3),
-                "ai_prob": round(ai_prob, 3),
-                "confidence_boost": confidence_boost,
-                "betting_edge": betting_edge,
-                "risk_level": f"{emoji} {risk_level}",
-                "why_this_pick": insight_reason,
-                "alt_line": "alternate" in market["key"]
-            }
-            prop_categories[category].append(prop_data)
-
-    # Filter function
-    def satisfies_filters(prop):
-        if min_odds is not None and prop["odds"] < min_odds:
-            return False
-        if max_odds is not None and prop["odds"] > max_odds:
-            return False
-        if confidence_level and not (confidence_level[0] <= prop["confidence_boost"] <= confidence_level[1]):
-            return False
-        return True
-
-    # Select props
+                seen_categories.add(category_id)
+                selected.append(i)
+        selected.extend(runners_up[:max(num_props - len(selected), 0)])
+
+        # Limit to the requested number of props
+        selected = heapq.nlargest(num_props, selected, key=lambda i: confidence_boosts[i])
+
+    # Build prop dicts only for the selected outcomes
     selected_props = []
-    for category in prop_categories:
-        category_props = [p for p in prop_categories[category] if satisfies_filters(p)]
-        if category_props:
-            best_prop = max(category_props, key=lambda x: x["confidence_boost"])
-            selected_props.append(best_prop)
-
-    all_filtered_props = [
-        p for cat in prop_categories.values()
-        for p in cat if satisfies_filters(p) and p not in selected_props
-    ]
-    all_filtered_props_sorted = sorted(all_filtered_props, key=lambda x: x["confidence_boost"], reverse=True)
-    while len(selected_props) < num_props and all_filtered_props_sorted:
-        selected_props.append(all_filtered_props_sorted.pop(0))
-
-    # Limit to the requested number of props
-    selected_props = sorted(selected_props, key=lambda x: x["confidence_boost"], reverse=True)[:num_props]
+    for i, risk_label in zip(selected, get_risk_labels(american_odds[selected])):
+        player_name, over_under, line_value, alt_line = outcomes[i]
+        confidence_boost = float(confidence_boosts[i])
+        selected_props.append({
+            "player": player_name,
+            "over_under": over_under,
+            "prop": CATEGORIES[category_ids[i]],
+            "line": line_value,
+            "odds": int(american_odds[i]),
+            "implied_prob": float(implied_probs[i]),
+            "ai_prob": float(ai_probs[i]),
+            "confidence_boost": confidence_boost,
+            "betting_edge": 0,
+            "risk_level": risk_label,
+            "why_this_pick": f"{player_name} has a {confidence_boost:.0f}% chance based on implied probability.",
+            "alt_line": alt_line
+        })
 
     # Handle case where no props are selected
     if not selected_props:
@@ -286,6 +668,65 @@ def fetch_sgp_builder(selected_game, num_props=1, min_odds=None, max_odds=None,
         "parlay_odds": parlay_odds
     }
 
+def _fetch_props_for_games(selected_games, event_ids, markets):
+    """
+    Fetch props for several games concurrently on the shared thread pool.
+
+    Worker threads have no Streamlit session to write to, so nothing is shown here;
+    each result carries its notice for the calling thread to report.
+
+    Args:
+        selected_games (list): Game dicts as returned by get_nba_games().
+        event_ids (dict): Maps each game's 'game_id' to its event ID, as returned by get_event_ids().
+        markets (tuple): Prop market keys to request.
+
+    Returns:
+        dict: Maps each game's 'game_id' to a (props payload, notice) pair.
+    """
+    def fetch(game):
+        event_id = event_ids[game["game_id"]]
+        if not event_id:
+            return {}, None
+        return _cache_lookup(_props_cache_key(event_id, markets)) or _fetch_props(event_id, markets)
+
+    return {game["game_id"]: result for game, result in zip(selected_games, EXECUTOR.map(fetch, selected_games))}
+
+def prefetch_props(selected_games, markets=PROP_MARKETS):
+    """
+    Fetch props for several games concurrently, warming the cache for fetch_sgp_builder.
+
+    Event IDs are resolved with a single request up front; the per-game props
+    fetches then run on the shared thread pool over the shared session.
+
+    Args:
+        selected_games (list): Game dicts as returned by get_nba_games().
+        markets (iterable, optional): Prop market keys to request (default: every category).
+
+    Returns:
+        dict: Maps each game's 'game_id' to its props payload ({} if unavailable).
+    """
+    results = _fetch_props_for_games(selected_games, get_event_ids(selected_games), tuple(markets))
+    return {game_id: _show_notice(result) for game_id, result in results.items()}
+
+def fetch_all_sgps(selected_games, **kwargs):
+    """
+    Build Same Game Parlays for several games, fetching their props concurrently.
+
+    Args:
+        selected_games (list): Game dicts as returned by get_nba_games().
+        **kwargs: Passed through to fetch_sgp_builder (num_props, min_odds, ...).
+
+    Returns:
+        list: One fetch_sgp_builder result per game, in the same order as selected_games.
+    """
+    # Only warm the cache here: each fetch_sgp_builder call reports its own game's notices,
+    # so showing them during the prefetch as well would repeat every error
+    by_matchup, _ = _cache_lookup("event_index") or _fetch_event_index()
+    if by_matchup is not FETCH_FAILED:
+        event_ids = {game["game_id"]: by_matchup.get((game["home_team"], game["away_team"])) for game in selected_games}
+        _fetch_props_for_games(selected_games, event_ids, tuple(kwargs.get("markets", PROP_MARKETS)))
+    return [fetch_sgp_builder(game, **kwargs) for game in selected_games]
+
 # Example usage
 if __name__ == "__main__":
     # Assuming selected_game is defined elsewhere